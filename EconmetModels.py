@@ -3,10 +3,14 @@
 """
 
 import torch
+from .PerceptronMain import PerceptronMain, Optimizers
+from .PerceptronMonitoring import DEFAULT_MONITOR
+from .PerceptronProfiling import NULL_PROFILER
+from .WorkhorseFunctions import PanelWorkhorse, PrecisionPolicy, WorkhorseFunctions
 
 # Single Layer Perceptron ARIMA
 class ArimaSlp(PerceptronMain):
-    def __init__(self, p, d, q, optimizer_function = Optimizers.sgd_optimizer, weight_decay = 0.0, add_bias = True):
+    def __init__(self, p, d, q, optimizer_function = Optimizers.sgd_optimizer, weight_decay = 0.0, add_bias = True, precision = "float64"):
         self.p = p
         self.d = d
         self.q = q
@@ -15,40 +19,49 @@ class ArimaSlp(PerceptronMain):
             activation_function="linear",
             optimizer_function=optimizer_function,
             weight_decay=weight_decay,
-            add_bias=add_bias
+            add_bias=add_bias,
+            precision=precision
         )
 
-    def fit(self, y, epochs, batch_size, learning_rate, momentum = 0, epoch_step=100):
-        if not isinstance(y, torch.Tensor):
-            y = torch.tensor(y, dtype=torch.float64)
+    def fit(self, y, epochs, batch_size, learning_rate, momentum = 0, epoch_step=100, profiler=None, monitor=None):
+        profiler = NULL_PROFILER if profiler is None else profiler
+        with profiler.phase("data_prep"):
+            if not isinstance(y, torch.Tensor):
+                y = torch.tensor(y, dtype=torch.float64)
+            # Lag matrices and OLS initial values use the parameter dtype (y's own dtype without a
+            # policy); training casts to the compute dtype
+            dtype = PrecisionPolicy.resolve(self.precision, default=y.dtype).param_dtype
+            y = y.to(dtype)
 
-        y_d = torch.diff(y, n=self.d) if self.d > 0 else y
+            y_d = torch.diff(y, n=self.d) if self.d > 0 else y
 
-        X_ar = torch.zeros((len(y_d) - self.p, self.p), dtype=torch.float64)
-        for t in range(self.p, len(y_d)):
-            X_ar[t - self.p] = y_d[t - self.p:t]
+            X_ar = torch.zeros((len(y_d) - self.p, self.p), dtype=dtype)
+            for t in range(self.p, len(y_d)):
+                X_ar[t - self.p] = y_d[t - self.p:t]
 
-        ar_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ar, y_d[self.p:].view(-1, 1)).view(-1, 1)
+            ar_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ar, y_d[self.p:].view(-1, 1), dtype=dtype).view(-1, 1)
 
-        residuals = y_d[self.p:] - X_ar.mm(ar_coeffs).view(-1)
+            residuals = y_d[self.p:] - X_ar.mm(ar_coeffs).view(-1)
 
-        X_ma = torch.zeros((len(residuals) - self.q + 1, self.q), dtype=torch.float64)
-        for t in range(self.q - 1, len(residuals)):
-            X_ma[t - self.q + 1] = residuals[t - self.q + 1:t + 1]
+            X_ma = torch.zeros((len(residuals) - self.q + 1, self.q), dtype=dtype)
+            for t in range(self.q - 1, len(residuals)):
+                X_ma[t - self.q + 1] = residuals[t - self.q + 1:t + 1]
 
-        ma_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ma, residuals[self.q - 1:].view(-1, 1)).view(-1, 1)  # Added .view(-1, 1)
+            ma_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ma, residuals[self.q - 1:].view(-1, 1), dtype=dtype).view(-1, 1)  # Added .view(-1, 1)
 
-        X = torch.cat((X_ar[:len(X_ma)], X_ma), dim=1)
+            X = torch.cat((X_ar[:len(X_ma)], X_ma), dim=1)
 
-        # Initialize AR and MA weights
-        initial_weights = torch.cat((ar_coeffs, ma_coeffs), dim=0).t()
-        self.weights[0] = initial_weights
+            # Initialize AR and MA weights
+            initial_weights = torch.cat((ar_coeffs, ma_coeffs), dim=0).t()
+            self.weights[0] = initial_weights
 
-        super().fit(X, y_d[self.p + self.q - 1:], epochs = epochs, batch_size = batch_size, learning_rate = learning_rate, momentum = momentum, epoch_step = epoch_step)
+        super().fit(X, y_d[self.p + self.q - 1:], epochs = epochs, batch_size = batch_size, learning_rate = learning_rate, momentum = momentum, epoch_step = epoch_step, profiler = profiler, monitor = monitor)
 
     def predict_next_period(self, y, horizon):
         if not isinstance(y, torch.Tensor):
             y = torch.tensor(y, dtype=torch.float64)
+        dtype = PrecisionPolicy.resolve(self.precision, default=y.dtype).param_dtype
+        y = y.to(dtype)
 
         y_d = torch.diff(y, n=self.d) if self.d > 0 else y
         predictions = []
@@ -62,26 +75,62 @@ class ArimaSlp(PerceptronMain):
             y_next = y_next_d + y[-1] if self.d > 0 else y_next_d
 
             predictions.append(y_next)
-            y_d = torch.cat((y_d, torch.tensor([y_next_d], dtype=torch.float64).unsqueeze(0)), dim=0)
-            y = torch.cat((y, torch.tensor([y_next], dtype=torch.float64).unsqueeze(0)), dim=0)
+            y_d = torch.cat((y_d, torch.tensor([y_next_d], dtype=dtype).unsqueeze(0)), dim=0)
+            y = torch.cat((y, torch.tensor([y_next], dtype=dtype).unsqueeze(0)), dim=0)
 
         return torch.tensor(predictions)
 
+# Dynamic Panel Perceptron: lags of y within each entity plus exogenous regressors,
+# trained on long-format (entity, time, y) data in mini-batches that never split an entity
+class DynamicPanelSlp(PerceptronMain):
+    def __init__(self, n_lags, n_exog = 0, hidden_layer_sizes = [], activation_function = "linear", transform = "demean", optimizer_function = Optimizers.sgd_optimizer, weight_decay = 0.0, add_bias = True, precision = "float64"):
+        self.n_lags = n_lags
+        self.n_exog = n_exog
+        # "demean" removes entity fixed effects, "difference" takes first differences, None uses levels
+        self.transform = transform
+        super().__init__(
+            layer_sizes=[n_lags + n_exog] + list(hidden_layer_sizes) + [1],
+            activation_function=activation_function,
+            optimizer_function=optimizer_function,
+            weight_decay=weight_decay,
+            add_bias=add_bias,
+            precision=precision
+        )
+
+    def panel_design(self, entity, time, y, X = None):
+        y = torch.as_tensor(y)
+        panel = PanelWorkhorse(entity, time, y, dtype=PrecisionPolicy.resolve(self.precision, default=y.dtype).param_dtype)
+        design, target, rows = panel.design(self.n_lags, exog=X, transform=self.transform)
+        return panel, design, target, rows
+
+    def fit(self, entity, time, y, epochs, batch_size, learning_rate, X = None, momentum = 0, epoch_step = 100, profiler = None, monitor = None):
+        profiler = NULL_PROFILER if profiler is None else profiler
+        with profiler.phase("data_prep"):
+            panel, design, target, rows = self.panel_design(entity, time, y, X)
+            batch_bounds = PanelWorkhorse.entity_batches(panel.codes[rows], batch_size)
+
+        super().fit(design, target, epochs = epochs, batch_size = batch_size, learning_rate = learning_rate, momentum = momentum, epoch_step = epoch_step, profiler = profiler, monitor = monitor, batch_bounds = batch_bounds)
+
+    def predict_panel(self, entity, time, y, X = None):
+        # Predictions for every row with enough history, on the transformed scale, with their entity and time
+        panel, design, _, rows = self.panel_design(entity, time, y, X)
+        return panel.entity[rows], panel.time[rows], super().predict(design)
+
 # Deep Instrumental Variable 
 class DeepIv:
-    def __init__(self, first_stage_layer_sizes, second_stage_layer_sizes, first_activation, second_activation, optimizer_function, add_bias = True):
-        self.first_stage_network = PerceptronMain(layer_sizes=first_stage_layer_sizes, activation_function=first_activation, optimizer_function=optimizer_function, add_bias = add_bias)
-        self.second_stage_network = PerceptronMain(layer_sizes=second_stage_layer_sizes, activation_function=second_activation, optimizer_function=optimizer_function, add_bias = add_bias)
+    def __init__(self, first_stage_layer_sizes, second_stage_layer_sizes, first_activation, second_activation, optimizer_function, add_bias = True, precision = None):
+        self.first_stage_network = PerceptronMain(layer_sizes=first_stage_layer_sizes, activation_function=first_activation, optimizer_function=optimizer_function, add_bias = add_bias, precision = precision)
+        self.second_stage_network = PerceptronMain(layer_sizes=second_stage_layer_sizes, activation_function=second_activation, optimizer_function=optimizer_function, add_bias = add_bias, precision = precision)
 
-    def fit(self, X, Z, y, epochs, batch_size, learning_rate, first_momentum = 0, second_momentum = 0, epoch_step = 100):
+    def fit(self, X, Z, y, epochs, batch_size, learning_rate, first_momentum = 0, second_momentum = 0, epoch_step = 100, profiler = None, monitor = None):
         # Fit the first-stage network using Z as input and X as output
-        self.first_stage_network.fit(Z, X, epochs, batch_size, learning_rate, first_momentum, epoch_step = epoch_step)
+        self.first_stage_network.fit(Z, X, epochs, batch_size, learning_rate, first_momentum, epoch_step = epoch_step, profiler = profiler, monitor = monitor)
 
         # Estimate the instrument variable
         estimated_IV = self.first_stage_network.predict(Z)
 
         # Fit the second-stage network using the estimated instrument variable and y
-        self.second_stage_network.fit(estimated_IV, y, epochs, batch_size, learning_rate, second_momentum, epoch_step=epoch_step)
+        self.second_stage_network.fit(estimated_IV, y, epochs, batch_size, learning_rate, second_momentum, epoch_step=epoch_step, profiler=profiler, monitor=monitor)
 
     def predict(self, X):
         # Estimate the instrument variable
@@ -93,31 +142,38 @@ class DeepIv:
 # Vector Autoencoding Nonlinear Autoregression
 class Vanar:
     def __init__(self, n_lags, n_variables, hidden_layer_sizes, n_components, autoencoder_wd = 0.0, forecast_wd = 0.0, add_bias = True, autoencoder_activ="linear", forecaster_activ="linear",
-                 autoen_optim=Optimizers.sgd_optimizer, fore_optim=Optimizers.sgd_optimizer):
+                 autoen_optim=Optimizers.sgd_optimizer, fore_optim=Optimizers.sgd_optimizer, precision=None):
         self.n_lags = n_lags
         self.n_variables = n_variables
+        self.precision = PrecisionPolicy.resolve(precision)
         self.autoencoder = PerceptronMain(
             layer_sizes=[n_variables * n_lags, n_components, n_variables * n_lags],
             activation_function=autoencoder_activ,
             optimizer_function=autoen_optim,
             weight_decay=autoencoder_wd,
-            add_bias = add_bias
+            add_bias = add_bias,
+            precision = self.precision
         )
         self.forecaster = PerceptronMain(
             layer_sizes=[n_lags] + hidden_layer_sizes + [1],
             activation_function=forecaster_activ,
             optimizer_function=fore_optim,
             weight_decay=forecast_wd,
-            add_bias = add_bias
+            add_bias = add_bias,
+            precision = self.precision
         )
 
     def initialize_forecaster_weights(self, X, y):
-        beta_hat = WorkhorseFunctions.ols_estimator_torch(X, y)
+        beta_hat = WorkhorseFunctions.ols_estimator_torch(X, y, dtype=self.forecaster.weights[0].dtype)
         self.forecaster.weights[0].data = beta_hat.t()
 
-    def fit(self, data, auto_epochs, fore_epochs, batch_size, learning_rate, first_momentum = 0, second_momentum=0, validation_split=0.2, epoch_step=None):
+    def fit(self, data, auto_epochs, fore_epochs, batch_size, learning_rate, first_momentum = 0, second_momentum=0, validation_split=0.2, epoch_step=None, profiler=None, monitor=None):
+        profiler = NULL_PROFILER if profiler is None else profiler
+        monitor = DEFAULT_MONITOR if monitor is None else monitor
         # Prepare the input-output pairs
-        X, y = WorkhorseFunctions.create_input_output_pairs(data, self.n_lags)
+        with profiler.phase("data_prep"):
+            dtype = PrecisionPolicy.resolve(self.precision, default=data.dtype).param_dtype
+            X, y = WorkhorseFunctions.create_input_output_pairs(data, self.n_lags, dtype=dtype)
     
         # Split the data into training and validation sets
         n_validation = int(validation_split * X.shape[0])
@@ -127,7 +183,9 @@ class Vanar:
         # Train the autoencoder
         self.autoencoder.fit(X_train, X_train, epochs=auto_epochs, batch_size=batch_size, learning_rate=learning_rate, 
                             momentum = first_momentum,
-                            epoch_step=epoch_step)
+                            epoch_step=epoch_step,
+                            profiler=profiler,
+                            monitor=monitor)
     
         # Encode the input data
         X_train_encoded = self.autoencoder.predict(X_train)[:, :self.n_lags]
@@ -142,14 +200,16 @@ class Vanar:
         # Train the forecaster
         self.forecaster.fit(X_train_encoded, y_train, epochs=fore_epochs, batch_size=batch_size, learning_rate=learning_rate,
                             momentum = second_momentum,
-                            epoch_step=epoch_step)
+                            epoch_step=epoch_step,
+                            profiler=profiler,
+                            monitor=monitor)
 
         self.X_encoded, self.y = torch.cat((X_train_encoded, X_val_encoded), dim=0), y
 
         # Compute validation MSE
         y_val_pred = self.forecaster.predict(X_val_encoded)
         mse_val = torch.mean((y_val_pred - y_val) ** 2)
-        print("Validation MSE:", mse_val.item())
+        monitor.emit("validation", model=type(self).__name__, mse=mse_val.item())
 
     def predict_next_period(self, data, horizon):
         predictions = []
@@ -159,11 +219,11 @@ class Vanar:
             X_encoded = self.autoencoder.predict(X)[:, :self.n_lags]
             y_next = self.forecaster.predict(X_encoded[-1].unsqueeze(0)).item()
             predictions.append(y_next)
-            data = torch.cat((data, torch.tensor([y_next])), dim=0)
+            data = torch.cat((data, torch.tensor([y_next], dtype=data.dtype)), dim=0)
 
         return torch.tensor(predictions)
 
-    def nonlinear_granger_causality(self, epochs, batch_size, learning_rate, momentum = 0, weight_decay = 0.0, activation_function="linear", exclude_variable=None):
+    def nonlinear_granger_causality(self, epochs, batch_size, learning_rate, momentum = 0, weight_decay = 0.0, activation_function="linear", exclude_variable=None, monitor=None):
         error_variance_full = self.compute_forecast_error_variance(self.X_encoded, self.y)
 
         gc_indices = []
@@ -178,7 +238,8 @@ class Vanar:
                 activation_function=activation_function,
                 optimizer_function=self.forecaster.optimizer_function,
                 weight_decay=weight_decay,
-                add_bias=self.forecaster.add_bias
+                add_bias=self.forecaster.add_bias,
+                precision=self.forecaster.precision
             )
 
             # Fit the reduced forecaster
@@ -186,7 +247,8 @@ class Vanar:
                 self.y, epochs=epochs, 
                 batch_size=batch_size, 
                 learning_rate=learning_rate,
-                momentum = momentum)
+                momentum = momentum,
+                monitor = monitor)
 
             error_variance_reduced = self.compute_forecast_error_variance(X_reduced_encoded, self.y, reduced_forecaster)
 
@@ -218,9 +280,9 @@ class Vanar:
         return torch.igamma(k / 2, x / 2)
 
 class DeepGmm:
-    def __init__(self, first_stage_layer_sizes, second_stage_layer_sizes, first_activation, second_activation, optimizer_function, add_bias=True):
-        self.first_stage_network = PerceptronMain(layer_sizes=first_stage_layer_sizes, activation_function=first_activation, optimizer_function=optimizer_function, add_bias=add_bias)
-        self.second_stage_network = PerceptronMain(layer_sizes=second_stage_layer_sizes, activation_function=second_activation, optimizer_function=optimizer_function, add_bias=add_bias)
+    def __init__(self, first_stage_layer_sizes, second_stage_layer_sizes, first_activation, second_activation, optimizer_function, add_bias=True, precision=None):
+        self.first_stage_network = PerceptronMain(layer_sizes=first_stage_layer_sizes, activation_function=first_activation, optimizer_function=optimizer_function, add_bias=add_bias, precision=precision)
+        self.second_stage_network = PerceptronMain(layer_sizes=second_stage_layer_sizes, activation_function=second_activation, optimizer_function=optimizer_function, add_bias=add_bias, precision=precision)
 
     def gmm_loss(self, y_pred, y_true, weights):
         moment_conditions = y_true - y_pred
@@ -230,9 +292,10 @@ class DeepGmm:
 
         return gmm_loss
 
-    def fit(self, X, Z, y, epochs, batch_size, learning_rate, first_momentum = 0, second_momentum = 0, gmm_steps=1, regularize=False, regularization_param=1e-6, epoch_step=100):
+    def fit(self, X, Z, y, epochs, batch_size, learning_rate, first_momentum = 0, second_momentum = 0, gmm_steps=1, regularize=False, regularization_param=1e-6, epoch_step=100, profiler=None, monitor=None):
+        monitor = DEFAULT_MONITOR if monitor is None else monitor
         # Fit the first-stage network using Z as input and X as output
-        self.first_stage_network.fit(Z, X, epochs, batch_size, learning_rate, first_momentum, epoch_step=epoch_step)
+        self.first_stage_network.fit(Z, X, epochs, batch_size, learning_rate, first_momentum, epoch_step=epoch_step, profiler=profiler, monitor=monitor)
 
         # Estimate the instrument variable
         estimated_IV = self.first_stage_network.predict(Z)
@@ -242,20 +305,21 @@ class DeepGmm:
 
         for step in range(gmm_steps):
             # Fit the second-stage network using the estimated instrument variable and y
-            self.second_stage_network.fit(estimated_IV, y, epochs, batch_size, learning_rate, second_momentum, epoch_step=epoch_step)
+            self.second_stage_network.fit(estimated_IV, y, epochs, batch_size, learning_rate, second_momentum, epoch_step=epoch_step, profiler=profiler, monitor=monitor)
 
             # Predict the outcome using the estimated instrument variable
             y_pred = self.second_stage_network.predict(estimated_IV)
 
-            # Calculate the moment conditions
+            # Calculate the moment conditions; the weight matrix inversion needs at least float32
             moment_conditions = y - y_pred
+            moment_conditions = moment_conditions.to(torch.promote_types(moment_conditions.dtype, torch.float32))
 
             # Update the GMM weights
             gmm_weights = self.update_gmm_weights(moment_conditions, regularize=regularize, regularization_param=regularization_param)
 
             # Calculate the GMM loss
-            loss = self.gmm_loss(y_pred, y, gmm_weights)
-            print(f"GMM step {step + 1}, loss: {loss.item()}")
+            loss = self.gmm_loss(y_pred.to(moment_conditions.dtype), y.to(moment_conditions.dtype), gmm_weights)
+            monitor.emit("gmm_step", model=type(self).__name__, step=step + 1, loss=loss.item())
 
     def update_gmm_weights(self, moment_conditions, regularize=False, regularization_param=1e-6):
         # Calculate the moment matrix
@@ -263,7 +327,7 @@ class DeepGmm:
 
         # Regularize the moment matrix if needed
         if regularize:
-            moment_matrix += regularization_param * torch.eye(moment_matrix.shape[0])
+            moment_matrix += regularization_param * torch.eye(moment_matrix.shape[0], dtype=moment_matrix.dtype)
 
         # Compute the inverse of the moment matrix
         inverse_moment_matrix = torch.inverse(moment_matrix)
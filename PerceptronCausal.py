@@ -1,10 +1,13 @@
 from collections import defaultdict
 import torch
-import pandas as pd
 import itertools
-from typing import Union
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
+from typing import TYPE_CHECKING, Union
+from .PerceptronMain import PerceptronMain, Optimizers
+from .WorkhorseFunctions import PrecisionPolicy, WorkhorseFunctions
+
+# pandas, matplotlib and plotly are only needed for annotations and plotting, so they are imported on use
+if TYPE_CHECKING:
+    import pandas as pd
 
 class CausalDAG:
     def __init__(self):
@@ -17,32 +20,29 @@ class CausalDAG:
         for node in self.graph:
             for neighbor in self.graph[node]:
                 print(f"{node} -> {neighbor}")
-                
-#import torch
-import pandas as pd
-import itertools
-from typing import Union
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
 
 class CausalInference:
-    def __init__(self, data: pd.DataFrame, treatment: str, outcome: str, graph: Union[CausalDAG, str] = None):
+    def __init__(self, data: "pd.DataFrame", treatment: str, outcome: str, graph: Union[CausalDAG, str] = None):
         self.data = data
         self.treatment = treatment
         self.outcome = outcome
         self.graph = graph
 
-    def estimate_effect(self, method_name="mdm", hidden_layer_sizes = [10], activation_function = "linear", optimizer_function = Optimizers.sgd_optimizer, momentum = 0.0, weight_decay = 0.0):
+    def estimate_effect(self, method_name="mdm", hidden_layer_sizes = [10], activation_function = "linear", optimizer_function = Optimizers.sgd_optimizer, momentum = 0.0, weight_decay = 0.0, precision = "float32", monitor = None):
         if not hasattr(self, "estimand"):
             self.identify_effect()
-    
-        X = torch.tensor(self.data.drop(columns=[self.treatment, self.outcome]).values).float()
-        y = torch.tensor(self.data[self.outcome].values).float()
-        treatment = torch.tensor(self.data[self.treatment].values).float()
+
+        # Data is held in the parameter dtype (the covariates' own dtype without a policy), since
+        # matching inverts a covariance matrix
+        X = torch.tensor(self.data.drop(columns=[self.treatment, self.outcome]).values)
+        dtype = PrecisionPolicy.resolve(precision, default=X.dtype).param_dtype
+        X = X.to(dtype)
+        y = torch.tensor(self.data[self.outcome].values).to(dtype)
+        treatment = torch.tensor(self.data[self.treatment].values).to(dtype)
 
         if method_name == "mdm":
             mdm = MahalanobisMatcher(perceptron=True)
-            mdm.fit(X, y, treatment, hidden_layer_sizes = hidden_layer_sizes, activation_function = activation_function, optimizer_function = optimizer_function, momentum = momentum, weight_decay = weight_decay)
+            mdm.fit(X, y, treatment, hidden_layer_sizes = hidden_layer_sizes, activation_function = activation_function, optimizer_function = optimizer_function, momentum = momentum, weight_decay = weight_decay, precision = precision, monitor = monitor)
             self.estimate = mdm.predict(X, treatment)
         else:
             raise ValueError(f"Unsupported estimation method: {method_name}")
@@ -84,15 +84,16 @@ class CausalInference:
         raise ValueError("No valid set of covariates found that satisfies the backdoor criterion.")
 
     def refute_effect(self, method_name="random_common_cause", **kwargs):
+        # kwargs (e.g. monitor, precision) are passed on to the estimator
         if not hasattr(self, "estimate"):
-            self.estimate_effect()
+            self.estimate_effect(**kwargs)
 
         if method_name == "random_common_cause":
-            return self.random_common_cause_refutation()
+            return self.random_common_cause_refutation(**kwargs)
         else:
             raise ValueError(f"Unsupported refutation method: {method_name}")
 
-    def random_common_cause_refutation(self, method_name="mdm", hidden_layer_sizes = [10], activation_function = "linear", optimizer_function = Optimizers.sgd_optimizer, momentum = 0.0, weight_decay = 0.0):
+    def random_common_cause_refutation(self, method_name="mdm", hidden_layer_sizes = [10], activation_function = "linear", optimizer_function = Optimizers.sgd_optimizer, momentum = 0.0, weight_decay = 0.0, precision = "float32", monitor = None):
         random_common_cause = torch.randn(len(self.data))
         data_with_random_common_cause = self.data.copy()
         data_with_random_common_cause["random_common_cause"] = random_common_cause
@@ -109,7 +110,9 @@ class CausalInference:
                                                 activation_function = activation_function,
                                                 optimizer_function = optimizer_function,
                                                 momentum = momentum,
-                                                weight_decay=weight_decay)
+                                                weight_decay=weight_decay,
+                                                precision=precision,
+                                                monitor=monitor)
         self.refutation_estimate = ate_estimate_with_random_common_cause
 
         return {
@@ -143,6 +146,11 @@ class CausalInference:
         original_estimate = self.estimate
         #estimate_with_random_common_cause = refutation_result["estimate_with_random_common_cause"]
 
+        if use_plotly:
+            import plotly.graph_objects as go
+        else:
+            import matplotlib.pyplot as plt
+
         if plot_type == "average":
             original_estimate_mean = torch.mean(original_estimate)
             estimate_with_random_common_cause_mean = torch.mean(estimate_with_random_common_cause)
@@ -185,24 +193,24 @@ class MahalanobisMatcher:
         self.n_neighbors = n_neighbors
         self.perceptron = perceptron
 
-    def fit(self, X, y, treatment, hidden_layer_sizes, activation_function, optimizer_function, momentum, weight_decay):
+    def fit(self, X, y, treatment, hidden_layer_sizes, activation_function, optimizer_function, momentum, weight_decay, precision=None, monitor=None):
         self.X = X
         self.y = y
         self.treatment = treatment
+        self.inv_cov_matrix = torch.inverse(WorkhorseFunctions.torch_cov(X, rowvar=False))
 
         if self.perceptron:
-            self.model = PerceptronMain([X.shape[1]] + hidden_layer_sizes + [1], activation_function = activation_function, optimizer_function = optimizer_function, weight_decay = weight_decay)
+            self.model = PerceptronMain([X.shape[1]] + hidden_layer_sizes + [1], activation_function = activation_function, optimizer_function = optimizer_function, weight_decay = weight_decay, precision = precision)
             self.model.fit(X, y, epochs=1000, 
             batch_size=32, 
             learning_rate=0.0001, 
             momentum = momentum,
-            epoch_step=100,)
+            epoch_step=100,
+            monitor = monitor)
 
     def predict(self, X, treatment_values):
-        # Compute the Mahalanobis distance
-        cov_matrix = torch.tensor(WorkhorseFunctions.torch_cov(self.X, rowvar=False))
-        inv_cov_matrix = torch.inverse(cov_matrix)
-        mahalanobis_distances = self.pairwise_mahalanobis_distances(X, self.X, inv_cov_matrix)
+        # Compute the Mahalanobis distance using the inverse covariance cached by fit
+        mahalanobis_distances = self.pairwise_mahalanobis_distances(X, self.X, self.inv_cov_matrix)
 
         # Find the indices of the closest n_neighbors for each instance in X
         _, neighbor_indices = torch.topk(-mahalanobis_distances, self.n_neighbors, dim=1)
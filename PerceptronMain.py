@@ -2,15 +2,23 @@
 Разработанный Адриелу Ванг от ДанСтат Консульти́рования
 """
 
+import time
+import warnings
 import torch
+from .PerceptronMonitoring import DEFAULT_MONITOR
+from .PerceptronProfiling import NULL_PROFILER
+from .WorkhorseFunctions import PrecisionPolicy
 class PerceptronMain:
-    def __init__(self, layer_sizes, activation_function, optimizer_function, weight_decay= 0.0, add_bias = True):
+    def __init__(self, layer_sizes, activation_function, optimizer_function, weight_decay= 0.0, add_bias = True, precision = None):
         self.layer_sizes = layer_sizes
+        self.activation_name = activation_function
         self.activation_function = TorchActivations.activation(activation_function)
         self.activation_derivative = TorchActivations.derivative(activation_function)
         self.optimizer_function = optimizer_function
         self.add_bias = add_bias
         self.weight_decay = weight_decay
+        # None keeps the dtype of the training data; see PrecisionPolicy for the presets
+        self.precision = PrecisionPolicy.resolve(precision)
         #self.optimizer_params = {}
         self.initialize_weights()
         if self.add_bias:
@@ -21,10 +29,19 @@ class PerceptronMain:
         self.velocity = None
         self.squared_gradients = [torch.zeros_like(w) for w in self.weights]
 
+    def compute_dtype(self):
+        # Models without a precision policy compute in the dtype of their weights
+        return self.weights[0].dtype if self.precision is None else self.precision.compute_dtype
+
     def forward(self, X):
+        # Master weights are cast to the compute dtype once per batch; a no-op when the dtypes match
+        dtype = self.compute_dtype()
+        self.compute_weights = [w.to(dtype) for w in self.weights]
         self.a_values = [X]
-        for w in self.weights:
+        for w in self.compute_weights[:-1]:
             self.a_values.append(self.activation_function(self.a_values[-1] @ w))
+        # The output layer is returned in the parameter dtype, so residuals against y are not rounded to the compute dtype
+        self.a_values.append(self.activation_function((self.a_values[-1] @ self.compute_weights[-1]).to(self.weights[-1].dtype)))
         return self.a_values[-1]
 
     def backward(self, X, y, learning_rate):
@@ -34,63 +51,182 @@ class PerceptronMain:
         if y.dim() == 1:
             y = y.view(-1, 1)
 
-        delta = (self.a_values[-1] - y) * self.activation_derivative(self.a_values[-2] @ self.weights[-1])
-        gradients[-1] = self.a_values[-2].t() @ delta + self.weight_decay * self.weights[-1]
+        # The output delta is formed in the parameter dtype; only matmul operands are cast to the compute dtype
+        weights = self.compute_weights
+        delta = (self.a_values[-1] - y) * self.activation_derivative((self.a_values[-2] @ weights[-1]).to(y.dtype))
+        delta = delta.to(weights[-1].dtype)
+        gradients[-1] = self.a_values[-2].t() @ delta + self.weight_decay * weights[-1]
 
-        for i in range(len(self.weights) - 2, -1, -1):
-            delta = (delta @ self.weights[i + 1].t()) * self.activation_derivative(self.a_values[i] @ self.weights[i])
-            gradients[i] = self.a_values[i].t() @ delta + self.weight_decay * self.weights[i]
+        for i in range(len(weights) - 2, -1, -1):
+            delta = (delta @ weights[i + 1].t()) * self.activation_derivative(self.a_values[i] @ weights[i])
+            gradients[i] = self.a_values[i].t() @ delta + self.weight_decay * weights[i]
 
-        return gradients
+        # The optimizer updates the master weights in their own dtype
+        return [g.to(w.dtype) for g, w in zip(gradients, self.weights)]
 
     def optimize(self, gradients, learning_rate, momentum):
         self.weights, self.velocity = self.optimizer_function(self.weights, gradients, learning_rate, self.weight_decay, momentum = momentum, velocity=self.velocity, squared_gradients=self.squared_gradients)
 
-    def fit(self, X, y, epochs, batch_size, learning_rate, momentum = 0, epoch_step=100):
+    def fit(self, X, y, epochs, batch_size, learning_rate, momentum = 0, epoch_step=100, profiler=None, monitor=None, batch_bounds=None):
         step = epoch_step
         current_epochs = epochs
-        if not isinstance(X, torch.Tensor):
-            X = torch.tensor(X)
+        profiler = NULL_PROFILER if profiler is None else profiler
+        monitor = DEFAULT_MONITOR if monitor is None else monitor
+        metrics, profiler = monitor.epoch_metrics(type(self).__name__, profiler)
+        fit_start = time.perf_counter()
 
-        self.initialize_weights(dtype=X.dtype)
+        with profiler.phase("data_prep"):
+            if not isinstance(X, torch.Tensor):
+                X = torch.tensor(X)
+            if not isinstance(y, torch.Tensor):
+                y = torch.tensor(y)
+
+            policy = PrecisionPolicy.resolve(self.precision, default=X.dtype)
+            self.initialize_weights(dtype=policy.param_dtype)
+            # Inputs feed matmuls in the compute dtype; targets stay in the parameter dtype
+            X, y = policy.compute(X), policy.param(y)
+
+            if self.add_bias:
+                # Add a column of 1s to the input data
+                X = torch.cat((X, torch.ones((X.shape[0], 1), dtype=X.dtype)), dim=1)
+
+            # Row offsets of each mini-batch; batch_bounds lets callers keep groups (e.g. panel entities) together
+            if batch_bounds is None:
+                batch_bounds = list(range(0, X.shape[0], batch_size)) + [X.shape[0]]
+            batch_bounds = batch_bounds.tolist() if isinstance(batch_bounds, torch.Tensor) else [int(bound) for bound in batch_bounds]
 
-        if self.add_bias:
-            # Add a column of 1s to the input data
-            X = torch.cat((X, torch.ones((X.shape[0], 1))), dim=1)
-        
         while current_epochs > 0:
-            print(f"Trying {current_epochs} epochs.")
+            monitor.emit("attempt_start", model=type(self).__name__, epochs=current_epochs)
             
             try:
                 with warnings.catch_warnings(record=True) as w:
                     warnings.simplefilter("always")
 
                     for epoch in range(current_epochs):
-                        for i in range(0, X.shape[0], batch_size):
-                            X_batch = X[i:min(i + batch_size, X.shape[0])]
-                            y_batch = y[i:min(i + batch_size, y.shape[0])]
-                            self.forward(X_batch)
-                            gradients = self.backward(X_batch, y_batch, learning_rate)
+                        if metrics is not None:
+                            metrics.start()
+                        for start, end in zip(batch_bounds[:-1], batch_bounds[1:]):
+                            X_batch = X[start:end]
+                            y_batch = y[start:end]
+                            with profiler.phase("forward"):
+                                self.forward(X_batch)
+                            with profiler.phase("backward"):
+                                gradients = self.backward(X_batch, y_batch, learning_rate)
                             
-                            self.optimize(gradients = gradients, learning_rate = learning_rate, momentum = momentum)
+                            with profiler.phase("optimizer_step"):
+                                self.optimize(gradients = gradients, learning_rate = learning_rate, momentum = momentum)
+                            if metrics is not None:
+                                metrics.batch(self.a_values[-1], y_batch, gradients)
+
+                        if metrics is not None:
+                            metrics.end(epoch=epoch, epochs=current_epochs)
 
                         if w:
                             raise RuntimeWarning("Overflow encountered during training.")
 
-                print(f"Training successful with {current_epochs} epochs.")
+                monitor.emit("train_end", model=type(self).__name__, epochs=current_epochs, seconds=time.perf_counter() - fit_start)
                 break
 
             except RuntimeWarning:
-                print(f"Warning encountered with {current_epochs} epochs. Reducing the number of epochs.")
+                monitor.emit("rollback", model=type(self).__name__, epochs=current_epochs, next_epochs=current_epochs - step)
                 current_epochs -= step
 
     def predict(self, X):
-        X = X.to(self.weights[0].dtype)
+        dtype = self.compute_dtype()
+        X = X.to(dtype)
         if self.add_bias:
             X = torch.cat((X, torch.ones((X.shape[0], 1), dtype=X.dtype)), dim=1)
         for w in self.weights[:-1]:
-            X = self.activation_function(X @ w)
-        return X @ self.weights[-1]
+            X = self.activation_function(X @ w.to(dtype))
+        return X @ self.weights[-1].to(dtype)
+
+# Ensemble of identically shaped perceptrons trained as one batched network.
+# Layer weights are stacked into (n_members, n, m) tensors so every forward,
+# backward and optimizer step is a single batched matmul over all members.
+# The optimizers are elementwise, so the fit loop and optimizer step are PerceptronMain's.
+class PerceptronEnsemble(PerceptronMain):
+    def __init__(self, n_members, layer_sizes, activation_function, optimizer_function, weight_decay = 0.0, add_bias = True, seeds = None, precision = None):
+        if seeds is not None and len(seeds) != n_members:
+            raise ValueError("seeds must have one entry per ensemble member.")
+        # Set before PerceptronMain.__init__, which draws the initial weights
+        self.n_members = n_members
+        self.seeds = seeds
+        super().__init__(list(layer_sizes), activation_function, optimizer_function, weight_decay = weight_decay, add_bias = add_bias, precision = precision)
+
+    def initialize_weights(self, dtype=torch.float64):
+        if self.seeds is None:
+            self.weights = [torch.randn(self.n_members, n, m, dtype=dtype) for n, m in zip(self.layer_sizes[:-1], self.layer_sizes[1:])]
+        else:
+            # Each member draws its layers from its own generator, so a member's initial weights depend only on its seed
+            member_weights = []
+            for seed in self.seeds:
+                generator = torch.Generator().manual_seed(seed)
+                member_weights.append([torch.randn(n, m, dtype=dtype, generator=generator) for n, m in zip(self.layer_sizes[:-1], self.layer_sizes[1:])])
+            self.weights = [torch.stack(layer) for layer in zip(*member_weights)]
+        self.velocity = None
+        self.squared_gradients = [torch.zeros_like(w) for w in self.weights]
+
+    def _activate(self, z, function):
+        # Put the batch dimension first so row-wise activations (softmax) reduce over observations, not members
+        return function(z.transpose(0, 1)).transpose(0, 1)
+
+    def forward(self, X):
+        # X is shared by all members: (batch, n) @ (members, n, m) broadcasts to (members, batch, m)
+        dtype = self.compute_dtype()
+        self.compute_weights = [w.to(dtype) for w in self.weights]
+        self.a_values = [X]
+        for w in self.compute_weights[:-1]:
+            self.a_values.append(self._activate(torch.matmul(self.a_values[-1], w), self.activation_function))
+        self.a_values.append(self._activate(torch.matmul(self.a_values[-1], self.compute_weights[-1]).to(self.weights[-1].dtype), self.activation_function))
+        return self.a_values[-1]
+
+    def backward(self, X, y, learning_rate):
+        gradients = [torch.zeros_like(w) for w in self.weights]
+
+        if y.dim() == 1:
+            y = y.view(-1, 1)
+
+        weights = self.compute_weights
+        delta = (self.a_values[-1] - y) * self._activate(torch.matmul(self.a_values[-2], weights[-1]).to(y.dtype), self.activation_derivative)
+        delta = delta.to(weights[-1].dtype)
+        gradients[-1] = torch.matmul(self.a_values[-2].transpose(-1, -2), delta) + self.weight_decay * weights[-1]
+
+        for i in range(len(weights) - 2, -1, -1):
+            delta = torch.matmul(delta, weights[i + 1].transpose(-1, -2)) * self._activate(torch.matmul(self.a_values[i], weights[i]), self.activation_derivative)
+            gradients[i] = torch.matmul(self.a_values[i].transpose(-1, -2), delta) + self.weight_decay * weights[i]
+
+        return [g.to(w.dtype) for g, w in zip(gradients, self.weights)]
+
+    def predict(self, X, aggregate="mean"):
+        dtype = self.compute_dtype()
+        X = X.to(dtype)
+        if self.add_bias:
+            X = torch.cat((X, torch.ones((X.shape[0], 1), dtype=X.dtype)), dim=1)
+        for w in self.weights[:-1]:
+            X = self._activate(torch.matmul(X, w.to(dtype)), self.activation_function)
+        member_predictions = torch.matmul(X, self.weights[-1].to(dtype))
+
+        if aggregate == "mean":
+            aggregated = torch.mean(member_predictions, dim=0)
+        elif aggregate == "median":
+            aggregated = torch.median(member_predictions, dim=0).values
+        else:
+            raise ValueError("Invalid aggregate value. Choose 'mean' or 'median'.")
+
+        return member_predictions, aggregated
+
+    def member(self, index):
+        # Extract a single trained member as a standalone PerceptronMain (e.g. for PerceptronShap)
+        network = PerceptronMain(layer_sizes=list(self.layer_sizes),
+                                 activation_function=self.activation_name,
+                                 optimizer_function=self.optimizer_function,
+                                 weight_decay=self.weight_decay,
+                                 add_bias=False,
+                                 precision=self.precision)
+        network.add_bias = self.add_bias
+        network.weights = [w[index].clone() for w in self.weights]
+        network.squared_gradients = [torch.zeros_like(w) for w in network.weights]
+        return network
     
 class Optimizers:
     @staticmethod
@@ -134,7 +270,7 @@ class TorchActivations:
     derivatives = {
         'sigmoid': lambda x: TorchActivations.activations['sigmoid'](x) * (1 - TorchActivations.activations['sigmoid'](x)),
         'tanh': lambda x: 1 - torch.pow(TorchActivations.activations['tanh'](x), 2),
-        'relu': lambda x: (x > 0).float(),
+        'relu': lambda x: (x > 0).to(x.dtype),
         'relu_squared': lambda x: 2 * torch.max(torch.zeros_like(x), x),
         'linear': lambda x: torch.ones_like(x),
         'softmax': lambda x: TorchActivations.activations['softmax'](x) * (1 - TorchActivations.activations['softmax'](x)),
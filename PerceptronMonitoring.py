@@ -0,0 +1,194 @@
+"""
+Разработанный Адриелу Ванг от ДанСтат Консульти́рования
+"""
+
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from .PerceptronProfiling import NULL_PROFILER, PhaseProfiler
+
+# Routes training events (attempts, rollbacks, epoch metrics, GMM steps, validation)
+# to pluggable sinks. Pass as fit(..., monitor=...). Per-epoch metrics are only
+# computed when a sink asks for them, and a monitor without sinks does nothing.
+class TrainingMonitor:
+    def __init__(self, sinks=(), label=None):
+        self.sinks = list(sinks)
+        self.label = label
+        self.collect_metrics = any(sink.wants_metrics for sink in self.sinks)
+
+    def emit(self, event, model=None, **fields):
+        if not self.sinks:
+            return
+        record = {"event": event, "model": self.label or model, "time": time.time(), **fields}
+        for sink in self.sinks:
+            sink.write(record)
+
+    def epoch_metrics(self, model, profiler):
+        # Returns (tracker, profiler); the tracker is None when no sink wants metrics
+        if not self.collect_metrics:
+            return None, profiler
+        if profiler is NULL_PROFILER:
+            profiler = PhaseProfiler()
+        return EpochMetrics(self, model, profiler), profiler
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+# Accumulates loss, gradient norm, samples and phase times over one epoch
+class EpochMetrics:
+    def __init__(self, monitor, model, profiler):
+        self.monitor = monitor
+        self.model = model
+        self.profiler = profiler
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.start_phases = dict(self.profiler.seconds)
+        self.samples = 0
+        self.batches = 0
+        self.squared_error = 0.0
+        self.outputs = 0
+        self.grad_norm = 0.0
+
+    def batch(self, prediction, y, gradients):
+        if y.dim() == 1:
+            y = y.view(-1, 1)
+        residuals = prediction - y
+        self.squared_error += float((residuals ** 2).sum())
+        self.outputs += residuals.numel()
+        self.grad_norm += math.sqrt(sum(float((g.float() ** 2).sum()) for g in gradients))
+        self.samples += y.shape[0]
+        self.batches += 1
+
+    def end(self, epoch, epochs):
+        seconds = time.perf_counter() - self.start_time
+        phases = {name: total - self.start_phases.get(name, 0.0) for name, total in self.profiler.seconds.items()}
+        self.monitor.emit("epoch_end", model=self.model,
+                          epoch=epoch, epochs=epochs,
+                          loss=self.squared_error / max(self.outputs, 1),
+                          grad_norm=self.grad_norm / max(self.batches, 1),
+                          samples=self.samples, seconds=seconds,
+                          samples_per_second=self.samples / seconds if seconds > 0 else None,
+                          phases=phases)
+
+class MetricsSink:
+    # Whether the fit loop should compute per-epoch metrics for this sink
+    wants_metrics = True
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+# Reproduces the messages fit loops used to print; it never requests metrics
+class PrintSink(MetricsSink):
+    wants_metrics = False
+    formats = {
+        "attempt_start": "Trying {epochs} epochs.",
+        "train_end": "Training successful with {epochs} epochs.",
+        "rollback": "Warning encountered with {epochs} epochs. Reducing the number of epochs.",
+        "gmm_step": "GMM step {step}, loss: {loss}",
+        "validation": "Validation MSE: {mse}",
+    }
+
+    def write(self, record):
+        message = self.formats.get(record["event"])
+        if message is not None:
+            print(message.format(**record))
+
+class InMemorySink(MetricsSink):
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def events(self, event):
+        return [record for record in self.records if record["event"] == event]
+
+class JsonlSink(MetricsSink):
+    def __init__(self, path):
+        self.file = open(path, "a", buffering=1)
+
+    def write(self, record):
+        self.file.write(json.dumps(record, default=str) + "\n")
+
+    def close(self):
+        self.file.close()
+
+# Keeps the latest value of each metric in Prometheus text format. render() returns
+# the exposition text; serve() exposes it on a local /metrics endpoint.
+class PrometheusSink(MetricsSink):
+    gauges = ("loss", "grad_norm", "samples_per_second", "seconds")
+
+    def __init__(self, prefix="econmet"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.values = {}
+        self.events = defaultdict(int)
+        self.phase_seconds = defaultdict(float)
+        self.samples = defaultdict(int)
+        self.server = None
+
+    def write(self, record):
+        model = record["model"] or "model"
+        with self.lock:
+            self.events[(model, record["event"])] += 1
+            if record["event"] == "epoch_end":
+                for name in self.gauges:
+                    if record.get(name) is not None:
+                        self.values[(name, model)] = record[name]
+                self.samples[model] += record["samples"]
+                for phase, seconds in record["phases"].items():
+                    self.phase_seconds[(model, phase)] += seconds
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name in self.gauges:
+                lines.append(f"# TYPE {self.prefix}_epoch_{name} gauge")
+                lines.extend(f'{self.prefix}_epoch_{metric}{{model="{model}"}} {value}' for (metric, model), value in self.values.items() if metric == name)
+            lines.append(f"# TYPE {self.prefix}_samples_total counter")
+            lines.extend(f'{self.prefix}_samples_total{{model="{model}"}} {value}' for model, value in self.samples.items())
+            lines.append(f"# TYPE {self.prefix}_phase_seconds_total counter")
+            lines.extend(f'{self.prefix}_phase_seconds_total{{model="{model}",phase="{phase}"}} {value}' for (model, phase), value in self.phase_seconds.items())
+            lines.append(f"# TYPE {self.prefix}_events_total counter")
+            lines.extend(f'{self.prefix}_events_total{{model="{model}",event="{event}"}} {value}' for (model, event), value in self.events.items())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=0, host="127.0.0.1"):
+        # http.server pulls in email, socketserver and mimetypes, so it is only imported when serving
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+# Used when fit is called without a monitor: prints the same messages as before
+DEFAULT_MONITOR = TrainingMonitor([PrintSink()])
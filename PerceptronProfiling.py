@@ -0,0 +1,51 @@
+"""
+Разработанный Адриелу Ванг от ДанСтат Консульти́рования
+"""
+
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Opt-in per-phase timer for fit loops. Pass an instance as fit(..., profiler=...)
+# to accumulate wall time for data_prep, forward, backward and optimizer_step.
+class PhaseProfiler:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def summary(self):
+        return {name: {"seconds": self.seconds[name], "calls": self.calls[name]} for name in self.seconds}
+
+    def dump(self, path=None):
+        # Writes the summary as JSON when a path is given, otherwise prints a table
+        summary = self.summary()
+        if path is not None:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+            return summary
+        total = sum(entry["seconds"] for entry in summary.values()) or 1.0
+        for name, entry in sorted(summary.items(), key=lambda item: -item[1]["seconds"]):
+            print(f"{name:>16}: {entry['seconds']:10.4f} s  {entry['calls']:8d} calls  {entry['seconds'] / total:6.1%}")
+        return summary
+
+# Stand-in used when no profiler is passed, so fit loops pay only for an empty context manager
+class _NullProfiler:
+    _context = nullcontext()
+
+    def phase(self, name):
+        return self._context
+
+NULL_PROFILER = _NullProfiler()
@@ -0,0 +1,189 @@
+"""
+Разработанный Адриелу Ванг от ДанСтат Консульти́рования
+"""
+
+import importlib
+import json
+import os
+import struct
+import tempfile
+import torch
+
+# Versioned model files: a JSON header with the architecture and a tensor table,
+# followed by one flat weight blob. The blob is memory-mapped on load, so loading
+# is zero-copy and forked workers share the same physical pages.
+class ModelSerializer:
+    MAGIC = b"ECONMETP"
+    FORMAT_VERSION = 1
+    ALIGNMENT = 64
+
+    # Module holding each serializable class
+    modules = {
+        "PerceptronMain": ".PerceptronMain",
+        "PerceptronEnsemble": ".PerceptronMain",
+        "ArimaSlp": ".EconmetModels",
+        "DynamicPanelSlp": ".EconmetModels",
+        "DeepIv": ".EconmetModels",
+        "DeepGmm": ".EconmetModels",
+        "Vanar": ".EconmetModels",
+        "MahalanobisMatcher": ".PerceptronCausal",
+    }
+
+    # (config attributes, tensor attributes, nested model attributes) per class.
+    # Missing attributes (e.g. on unfitted models) are skipped.
+    _perceptron_config = ("layer_sizes", "activation_name", "weight_decay", "add_bias")
+    attributes = {
+        "PerceptronMain": (_perceptron_config, ("weights",), ()),
+        "PerceptronEnsemble": (_perceptron_config + ("n_members", "seeds"), ("weights",), ()),
+        "ArimaSlp": (_perceptron_config + ("p", "d", "q"), ("weights",), ()),
+        "DynamicPanelSlp": (_perceptron_config + ("n_lags", "n_exog", "transform"), ("weights",), ()),
+        "DeepIv": ((), (), ("first_stage_network", "second_stage_network")),
+        "DeepGmm": ((), (), ("first_stage_network", "second_stage_network")),
+        "Vanar": (("n_lags", "n_variables"), ("X_encoded", "y"), ("autoencoder", "forecaster")),
+        "MahalanobisMatcher": (("n_neighbors", "perceptron"), ("X", "y", "treatment", "inv_cov_matrix"), ("model",)),
+    }
+
+    @staticmethod
+    def save(model, path):
+        tensors = []
+        architecture = ModelSerializer._describe(model, "", tensors)
+
+        table = []
+        offset = 0
+        for name, tensor in tensors:
+            nbytes = tensor.numel() * tensor.element_size()
+            table.append({"name": name, "dtype": str(tensor.dtype).replace("torch.", ""), "shape": list(tensor.shape), "offset": offset, "nbytes": nbytes})
+            offset = ModelSerializer._align(offset + nbytes)
+
+        header = json.dumps({"version": ModelSerializer.FORMAT_VERSION, "architecture": architecture, "tensors": table}).encode("utf-8")
+        blob_start = ModelSerializer._align(len(ModelSerializer.MAGIC) + 8 + len(header))
+
+        # Write a temporary file and rename it over path. Truncating path in place would pull the
+        # pages out from under models already loaded from it (SIGBUS); after the rename those
+        # mappings keep the old inode.
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(ModelSerializer.MAGIC)
+                f.write(struct.pack("<Q", len(header)))
+                f.write(header)
+                for (name, tensor), entry in zip(tensors, table):
+                    f.write(b"\0" * (blob_start + entry["offset"] - f.tell()))
+                    f.write(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(temporary_path, 0o644)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            if f.read(len(ModelSerializer.MAGIC)) != ModelSerializer.MAGIC:
+                raise ValueError(f"{path} is not an EconmetPerceptron model file.")
+            header_length, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_length).decode("utf-8"))
+
+        if header["version"] > ModelSerializer.FORMAT_VERSION:
+            raise ValueError(f"Unsupported model file version {header['version']}; this release reads up to version {ModelSerializer.FORMAT_VERSION}.")
+
+        blob_start = ModelSerializer._align(len(ModelSerializer.MAGIC) + 8 + header_length)
+        file_size = os.path.getsize(path)
+        # Private mapping: pages come straight from the page cache and are only copied if written to
+        mapped = torch.from_file(path, shared=False, size=file_size, dtype=torch.uint8)
+
+        tensors = {}
+        for entry in header["tensors"]:
+            start = blob_start + entry["offset"]
+            raw = mapped[start:start + entry["nbytes"]]
+            tensors[entry["name"]] = raw.view(getattr(torch, entry["dtype"])).view(entry["shape"])
+
+        return ModelSerializer._build(header["architecture"], "", tensors)
+
+    @staticmethod
+    def _align(offset):
+        return -(-offset // ModelSerializer.ALIGNMENT) * ModelSerializer.ALIGNMENT
+
+    @staticmethod
+    def _describe(model, prefix, tensors):
+        class_name = type(model).__name__
+        if class_name not in ModelSerializer.attributes:
+            raise TypeError(f"Cannot serialize objects of type {class_name}.")
+        config_names, tensor_names, model_names = ModelSerializer.attributes[class_name]
+
+        config = {name: getattr(model, name) for name in config_names if hasattr(model, name)}
+        if hasattr(model, "optimizer_function"):
+            config["optimizer_function"] = ModelSerializer._optimizer_name(model.optimizer_function)
+        if hasattr(model, "precision"):
+            # Stored even when None, so every model with a policy attribute gets one back on load
+            config["precision"] = None if model.precision is None else [str(model.precision.compute_dtype).replace("torch.", ""), str(model.precision.param_dtype).replace("torch.", "")]
+
+        stored_tensors = {}
+        for name in tensor_names:
+            value = getattr(model, name, None)
+            if value is None:
+                continue
+            if isinstance(value, torch.Tensor):
+                tensors.append((prefix + name, value))
+                stored_tensors[name] = None
+            else:
+                for i, tensor in enumerate(value):
+                    tensors.append((f"{prefix}{name}.{i}", tensor))
+                stored_tensors[name] = len(value)
+
+        nested = {name: ModelSerializer._describe(getattr(model, name), f"{prefix}{name}/", tensors)
+                  for name in model_names if getattr(model, name, None) is not None}
+
+        return {"class": class_name, "config": config, "tensors": stored_tensors, "models": nested}
+
+    @staticmethod
+    def _build(architecture, prefix, tensors):
+        class_name = architecture["class"]
+        module = importlib.import_module(ModelSerializer.modules[class_name], __package__)
+        model = getattr(module, class_name).__new__(getattr(module, class_name))
+
+        for name, value in architecture["config"].items():
+            setattr(model, name, value)
+
+        for name, length in architecture["tensors"].items():
+            if length is None:
+                setattr(model, name, tensors[prefix + name])
+            else:
+                setattr(model, name, [tensors[f"{prefix}{name}.{i}"] for i in range(length)])
+
+        for name, nested in architecture["models"].items():
+            setattr(model, name, ModelSerializer._build(nested, f"{prefix}{name}/", tensors))
+
+        if "activation_name" in architecture["config"]:
+            # Activations and optimizers are stored by name and rebound here
+            activations = importlib.import_module(".PerceptronMain", __package__).TorchActivations
+            model.activation_function = activations.activation(model.activation_name)
+            model.activation_derivative = activations.derivative(model.activation_name)
+            # Optimizer state is left empty so loading allocates nothing beyond the mapping
+            model.velocity = None
+            model.squared_gradients = None
+        if "optimizer_function" in architecture["config"]:
+            optimizers = importlib.import_module(".PerceptronMain", __package__).Optimizers
+            model.optimizer_function = getattr(optimizers, model.optimizer_function)
+        if architecture["config"].get("precision") is not None:
+            # Any model with a precision policy (perceptrons, Vanar) stores it as [compute, param] dtype names
+            policy = importlib.import_module(".WorkhorseFunctions", __package__).PrecisionPolicy
+            precision = architecture["config"]["precision"]
+            model.precision = policy(getattr(torch, precision[0]), getattr(torch, precision[1]))
+        elif "activation_name" in architecture["config"]:
+            # Files written before precision policies existed
+            model.precision = None
+
+        return model
+
+    @staticmethod
+    def _optimizer_name(optimizer_function):
+        optimizers = importlib.import_module(".PerceptronMain", __package__).Optimizers
+        name = getattr(optimizer_function, "__name__", None)
+        if name is None or getattr(optimizers, name, None) is not optimizer_function:
+            raise ValueError("Only optimizers defined on Optimizers can be serialized.")
+        return name
@@ -0,0 +1,145 @@
+"""
+Разработанный Адриелу Ванг от ДанСтат Консульти́рования
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import torch
+
+# Inference-only evaluator for a fitted PerceptronMain. The bias row is folded
+# into an affine first layer (addmm, no ones column), inputs are cast once, and
+# the forward pass can be traced with TorchScript or compiled with torch.compile.
+class PerceptronInference:
+    def __init__(self, perceptron, backend=None, example_batch_size=1):
+        self.activation_function = perceptron.activation_function
+        self.dtype = perceptron.compute_dtype()
+        weights = [w.detach().to(self.dtype) for w in perceptron.weights]
+
+        if perceptron.add_bias:
+            # The bias column is appended last, so its weights are the last row of the first layer
+            self.first_weight, self.first_bias = weights[0][:-1].contiguous(), weights[0][-1].contiguous()
+        else:
+            self.first_weight, self.first_bias = weights[0].contiguous(), torch.zeros(weights[0].shape[1], dtype=self.dtype)
+        self.hidden_weights = [w.contiguous() for w in weights[1:]]
+        self.n_features = self.first_weight.shape[0]
+
+        if backend is None:
+            self.evaluator = self._evaluate
+        elif backend == "trace":
+            example = torch.zeros(example_batch_size, self.n_features, dtype=self.dtype)
+            with torch.no_grad():
+                self.evaluator = torch.jit.trace(self._evaluate, example, check_trace=False)
+        elif backend == "compile":
+            self.evaluator = torch.compile(self._evaluate, dynamic=True)
+        else:
+            raise ValueError("Invalid backend value. Choose None, 'trace' or 'compile'.")
+
+    def _evaluate(self, X):
+        # Same computation as PerceptronMain.predict: activations on every layer except the output
+        if not self.hidden_weights:
+            return torch.addmm(self.first_bias, X, self.first_weight)
+        X = self.activation_function(torch.addmm(self.first_bias, X, self.first_weight))
+        for w in self.hidden_weights[:-1]:
+            X = self.activation_function(X @ w)
+        return X @ self.hidden_weights[-1]
+
+    def predict(self, X):
+        if not isinstance(X, torch.Tensor):
+            X = torch.as_tensor(X, dtype=self.dtype)
+        if X.dim() == 1:
+            X = X.view(1, -1)
+        with torch.inference_mode():
+            return self.evaluator(X.to(self.dtype))
+
+# Coalesces concurrent single-row requests into one batched predict call. A batch
+# is dispatched once it holds max_batch_size rows or its oldest request has waited
+# max_latency seconds, whichever comes first.
+class MicroBatcher:
+    def __init__(self, predict_function, max_batch_size=64, max_latency=0.002):
+        self.predict_function = predict_function
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.requests = queue.Queue()
+        self._closed = False
+        # Serializes submit against close so no request can be queued behind the stop sentinel
+        self._lock = threading.Lock()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def submit(self, row):
+        row = torch.as_tensor(row).reshape(-1)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            self.requests.put((row, future, time.perf_counter()))
+        return future
+
+    def predict(self, row, timeout=None):
+        return self.submit(row).result(timeout=timeout)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.requests.put(None)
+        self.worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            batch = [request]
+            # The deadline counts from when the oldest request was submitted, not when it was dequeued
+            deadline = request[2] + self.max_latency
+            stop = False
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+
+            self._dispatch(batch)
+            if stop:
+                return
+
+    def _dispatch(self, batch):
+        # Requests whose futures were cancelled by the caller are dropped before stacking
+        batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        futures = [future for _, future, _ in batch]
+        try:
+            predictions = self.predict_function(torch.stack([row for row, _, _ in batch]))
+        except Exception as error:
+            for future in futures:
+                MicroBatcher._deliver(future.set_exception, error)
+            return
+        for future, prediction in zip(futures, predictions):
+            MicroBatcher._deliver(future.set_result, prediction)
+
+    @staticmethod
+    def _deliver(setter, value):
+        # A future that cannot take its result must not take the worker thread down with it
+        try:
+            setter(value)
+        except Exception:
+            pass
@@ -4,8 +4,6 @@
 
 import torch
 import itertools
-import plotly.graph_objects as go
-import matplotlib.pyplot as plt
 
 class PerceptronShap:
     def __init__(self, perceptron, num_samples=1000):
@@ -43,10 +41,14 @@ class PerceptronShap:
         expected_value = expected_value.item()
 
         if is_plotly:
+            import plotly.graph_objects as go
+
             fig = go.Figure(go.Bar(y=feature_names, x=shap_values, orientation='h'))
             fig.update_layout(title=f"SHAP Values (Base value: {expected_value:.2f})")
             fig.show()
         else:
+            import matplotlib.pyplot as plt
+
             plt.barh(feature_names, shap_values)
             plt.title(f"SHAP Values (Base value: {expected_value:.2f})")
             plt.show()
@@ -70,10 +72,14 @@ class PerceptronShap:
         mean_expected_value = mean_expected_value.item()
 
         if is_plotly:
+            import plotly.graph_objects as go
+
             fig = go.Figure(go.Bar(y=feature_names, x=aggregated_shap_values.tolist(), orientation='h'))
             fig.update_layout(title=f"Aggregated SHAP Values (Mean base value: {mean_expected_value:.2f})")
             fig.show()
         else:
+            import matplotlib.pyplot as plt
+
             plt.barh(feature_names, aggregated_shap_values)
             plt.title(f"Aggregated SHAP Values (Mean base value: {mean_expected_value:.2f})")
             plt.show()
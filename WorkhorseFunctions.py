@@ -4,10 +4,49 @@
 
 import torch
 
+# Precision used by a model: compute_dtype for matmuls in training and prediction,
+# param_dtype for the master weights, lag matrices and OLS solves. bfloat16 computes
+# in bfloat16 but keeps float32 master weights, since linear solves and small weight
+# updates are not reliable in bfloat16.
+class PrecisionPolicy:
+    presets = {
+        "float64": (torch.float64, torch.float64),
+        "float32": (torch.float32, torch.float32),
+        "bfloat16": (torch.bfloat16, torch.float32),
+    }
+
+    def __init__(self, compute_dtype, param_dtype=None):
+        self.compute_dtype = compute_dtype
+        self.param_dtype = compute_dtype if param_dtype is None else param_dtype
+
+    @staticmethod
+    def resolve(precision, default=None):
+        # Accepts a preset name, a torch dtype or a PrecisionPolicy; None falls back to default
+        if precision is None:
+            return None if default is None else PrecisionPolicy.resolve(default)
+        if isinstance(precision, PrecisionPolicy):
+            return precision
+        if isinstance(precision, torch.dtype):
+            return PrecisionPolicy(precision)
+        if precision not in PrecisionPolicy.presets:
+            raise ValueError(f"Invalid precision {precision!r}. Choose one of {list(PrecisionPolicy.presets)}.")
+        return PrecisionPolicy(*PrecisionPolicy.presets[precision])
+
+    def compute(self, tensor):
+        return tensor.to(self.compute_dtype)
+
+    def param(self, tensor):
+        return tensor.to(self.param_dtype)
+
+    def __repr__(self):
+        return f"PrecisionPolicy(compute_dtype={self.compute_dtype}, param_dtype={self.param_dtype})"
+
 class WorkhorseFunctions:
 
     @staticmethod
-    def ols_estimator_torch(X, y):
+    def ols_estimator_torch(X, y, dtype=None):
+        if dtype is not None:
+            X, y = X.to(dtype), y.to(dtype)
         y = y.view(-1, y.shape[-1])  # Reshape y to have the right dimensions
         XtX = X.t().mm(X)
         Xty = X.t().mm(y)
@@ -15,7 +54,14 @@ class WorkhorseFunctions:
         return beta_hat
 
     @staticmethod
-    def create_input_output_pairs(data, n_lags):
+    def torch_cov(X, rowvar=True):
+        # Covariance matrix; rows are variables when rowvar is True, as in numpy.cov
+        return torch.cov(X if rowvar else X.t())
+
+    @staticmethod
+    def create_input_output_pairs(data, n_lags, dtype=None):
+        if dtype is not None:
+            data = data.to(dtype)
         X, y = [], []
         for i in range(n_lags, len(data)):
             X.append(data[i - n_lags:i].flatten())
@@ -25,23 +71,23 @@ class WorkhorseFunctions:
 class TimeSeriesWorkhorse:
 
     # Initialize AR and MA parameters using OLS estimation
-    def initialize_params_torch(y, p, q):
+    def initialize_params_torch(y, p, q, dtype=torch.float64):
         # AR part
-        X_ar = torch.zeros((len(y) - p, p), dtype=torch.float64)
+        X_ar = torch.zeros((len(y) - p, p), dtype=dtype)
         for t in range(p, len(y)):
             for i in range(p):
                 X_ar[t - p, i] = y[t - i - 1]
-        ar_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ar, y[p:].view(-1, 1))
+        ar_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ar, y[p:].view(-1, 1), dtype=dtype)
 
         # Compute the residuals
         residuals = y[p:] - X_ar.mm(ar_coeffs).view(-1)
 
         # MA part
-        X_ma = torch.zeros((len(residuals) - q, q), dtype=torch.float64)
+        X_ma = torch.zeros((len(residuals) - q, q), dtype=dtype)
         for t in range(q, len(residuals)):
             for j in range(q):
                 X_ma[t - q, j] = residuals[t - j - 1]
-        ma_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ma, residuals[q:].view(-1, 1))
+        ma_coeffs = WorkhorseFunctions.ols_estimator_torch(X_ma, residuals[q:].view(-1, 1), dtype=dtype)
 
         return ar_coeffs.view(-1), ma_coeffs.view(-1)
 
@@ -72,14 +118,17 @@ class TimeSeriesWorkhorse:
 
         return -log_likelihood, -gradients
 
-    def arima_estimator_torch(y, p, d, q, learning_rate=0.01, n_iterations=500):
+    def arima_estimator_torch(y, p, d, q, learning_rate=0.01, n_iterations=500, precision="float64"):
+        # The likelihood and its gradients are accumulated in the policy's parameter dtype
         if not isinstance(y, torch.Tensor):
                 y = torch.tensor(y, dtype=torch.float64)
+        dtype = PrecisionPolicy.resolve(precision, default=y.dtype).param_dtype
+        y = y.to(dtype)
         if d > 0:
             y = torch.diff(y, n=d)
         # Initialize the AR, MA, and intercept parameters using OLS
-        ar_coeffs, ma_coeffs = TimeSeriesWorkhorse.initialize_params_torch(y, p, q)
-        params = torch.cat((ar_coeffs, ma_coeffs, torch.zeros(1, dtype=torch.float64)), dim=0)
+        ar_coeffs, ma_coeffs = TimeSeriesWorkhorse.initialize_params_torch(y, p, q, dtype=dtype)
+        params = torch.cat((ar_coeffs, ma_coeffs, torch.zeros(1, dtype=dtype)), dim=0)
 
         # Optimize the negative log-likelihood using custom SGD
         for i in range(n_iterations):
@@ -90,3 +139,91 @@ class TimeSeriesWorkhorse:
         ma_coeffs = params[p:p + q]
         intercept = params[-1]
         return ar_coeffs, ma_coeffs, intercept
+
+# Long-format panel (entity, time, values) sorted by entity then time, so every
+# entity is one contiguous segment. Lags, differences and within-entity demeaning
+# are computed with segment arithmetic over the whole panel instead of a groupby loop.
+# Lags and differences are positional within an entity: gaps in time are not filled.
+class PanelWorkhorse:
+    def __init__(self, entity, time, values, dtype=None):
+        entity, time, values = torch.as_tensor(entity), torch.as_tensor(time), torch.as_tensor(values)
+        if values.dim() == 1:
+            values = values.view(-1, 1)
+        if dtype is not None:
+            values = values.to(dtype)
+
+        # Stable sorts: by time, then by entity, keeps time order within each entity
+        order = torch.argsort(time, stable=True)
+        order = order[torch.argsort(entity[order], stable=True)]
+        self.order = order
+        self.entity, self.time, self.values = entity[order], time[order], values[order]
+
+        n = self.entity.shape[0]
+        new_segment = torch.ones(n, dtype=torch.bool)
+        new_segment[1:] = self.entity[1:] != self.entity[:-1]
+        self.codes = torch.cumsum(new_segment, dim=0) - 1
+        self.starts = torch.nonzero(new_segment).view(-1)
+        self.counts = torch.diff(torch.cat((self.starts, torch.tensor([n]))))
+        self.n_entities = self.starts.shape[0]
+        self.position = torch.arange(n) - self.starts[self.codes]
+
+    def lags(self, values, n_lags, min_position=0):
+        # Rows with n_lags earlier observations (and at least min_position) in their own entity.
+        # Returns the row indices and a (rows, n_lags * variables) matrix ordered lag 1, lag 2, ...
+        rows = torch.nonzero(self.position >= max(n_lags, min_position)).view(-1)
+        offsets = torch.arange(1, n_lags + 1)
+        lagged = values[rows.view(-1, 1) - offsets.view(1, -1)]
+        return rows, lagged.reshape(rows.shape[0], -1)
+
+    def difference(self, values, order=1):
+        # Differences within each entity; the first `order` rows of an entity are invalid and left as NaN
+        differenced = values.clone()
+        for _ in range(order):
+            differenced[1:] = differenced[1:] - differenced[:-1]
+        differenced[self.position < order] = float("nan")
+        return differenced
+
+    def demean(self, values, rows=None):
+        # Subtracts entity means (the fixed-effect within transformation), optionally over a subset of rows
+        codes = self.codes if rows is None else self.codes[rows]
+        values = values if rows is None else values[rows]
+        sums = torch.zeros((self.n_entities,) + tuple(values.shape[1:]), dtype=values.dtype).index_add_(0, codes, values)
+        counts = torch.bincount(codes, minlength=self.n_entities).clamp(min=1).to(values.dtype)
+        return values - (sums / counts.view((-1,) + (1,) * (values.dim() - 1)))[codes]
+
+    def design(self, n_lags, exog=None, transform=None):
+        # Dynamic panel design: lags of the values plus current exogenous regressors.
+        # transform is None, "difference" (first differences) or "demean" (within transformation).
+        values = self.values
+        exog = None if exog is None else torch.as_tensor(exog).view(self.values.shape[0], -1)[self.order].to(values.dtype)
+        min_position = 0
+        if transform == "difference":
+            values = self.difference(values)
+            exog = None if exog is None else self.difference(exog)
+            min_position = n_lags + 1
+        elif transform == "demean":
+            values = self.demean(values)
+            exog = None if exog is None else self.demean(exog)
+        elif transform is not None:
+            raise ValueError("Invalid transform value. Choose None, 'difference' or 'demean'.")
+
+        rows, X = self.lags(values, n_lags, min_position=min_position)
+        if exog is not None:
+            X = torch.cat((X, exog[rows]), dim=1)
+        return X, values[rows], rows
+
+    @staticmethod
+    def entity_batches(codes, rows_per_batch):
+        # Row bounds of mini-batches that never split an entity. Entities are added to a batch
+        # until its running row count reaches rows_per_batch, so a larger entity gets its own batch
+        n = codes.shape[0]
+        if n == 0:
+            return torch.tensor([0])
+        ends = torch.nonzero(torch.cat((codes[1:] != codes[:-1], torch.tensor([True])))).view(-1) + 1
+        bounds = [0]
+        for end in ends.tolist():
+            if end - bounds[-1] >= rows_per_batch:
+                bounds.append(end)
+        if bounds[-1] != n:
+            bounds.append(n)
+        return torch.tensor(bounds)
@@ -1,5 +1,30 @@
-from .EconmetModels import *
-from .PerceptronMain import *
-from .PerceptronShap import *
-from .WorkhorseFunctions import *
-from .PerceptronCausal import *
+"""
+Разработанный Адриелу Ванг от ДанСтат Консульти́рования
+"""
+
+# Every module needs only torch at import time; matplotlib, plotly and pandas are
+# imported inside the methods that use them. Several classes share their module's
+# name (PerceptronMain, WorkhorseFunctions, PerceptronShap), so the classes are
+# imported by name here rather than resolved lazily, which would leave the package
+# attribute pointing at the submodule once a sibling module imports it.
+from .WorkhorseFunctions import WorkhorseFunctions, TimeSeriesWorkhorse, PrecisionPolicy, PanelWorkhorse
+from .PerceptronProfiling import PhaseProfiler
+from .PerceptronMonitoring import TrainingMonitor, MetricsSink, PrintSink, InMemorySink, JsonlSink, PrometheusSink
+from .PerceptronMain import PerceptronMain, PerceptronEnsemble, Optimizers, TorchActivations
+from .EconmetModels import ArimaSlp, DynamicPanelSlp, DeepIv, Vanar, DeepGmm
+from .PerceptronShap import PerceptronShap
+from .PerceptronCausal import CausalDAG, CausalInference, MahalanobisMatcher
+from .PerceptronSerialization import ModelSerializer
+from .PerceptronServing import PerceptronInference, MicroBatcher
+
+__all__ = [
+    "WorkhorseFunctions", "TimeSeriesWorkhorse", "PrecisionPolicy", "PanelWorkhorse",
+    "PhaseProfiler",
+    "TrainingMonitor", "MetricsSink", "PrintSink", "InMemorySink", "JsonlSink", "PrometheusSink",
+    "PerceptronMain", "PerceptronEnsemble", "Optimizers", "TorchActivations",
+    "ArimaSlp", "DynamicPanelSlp", "DeepIv", "Vanar", "DeepGmm",
+    "PerceptronShap",
+    "CausalDAG", "CausalInference", "MahalanobisMatcher",
+    "ModelSerializer",
+    "PerceptronInference", "MicroBatcher",
+]
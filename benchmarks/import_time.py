@@ -0,0 +1,66 @@
+"""
+Разработанный Адриелу Ванг от ДанСтат Консульти́рования
+
+Cold-start import benchmark. Each measurement runs in a fresh interpreter and
+compares importing the package (plus touching the core estimators) against
+importing torch alone. Exits with status 1 when the overhead exceeds the budget.
+
+    python benchmarks/import_time.py --repeats 5 --budget 0.25
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = os.path.basename(REPO_ROOT)
+
+SNIPPETS = {
+    "torch": "import torch",
+    # ArimaSlp first: its module imports PerceptronMain, which must still resolve to the class
+    "core": (f"import {PACKAGE_NAME} as ep\n"
+             "for name in ['ArimaSlp'] + ep.__all__:\n"
+             "    assert isinstance(getattr(ep, name), type), name"),
+    "full": (f"from {PACKAGE_NAME} import *\n"
+             "assert all(isinstance(value, type) for value in (PerceptronMain, WorkhorseFunctions, PerceptronShap))"),
+}
+
+HEAVY_MODULES = ("matplotlib", "plotly", "pandas")
+
+def measure(snippet):
+    # Wall time and peak RSS of the import in a clean interpreter
+    code = (
+        "import resource, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"{snippet}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ','.join(heavy))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(REPO_ROOT) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    output = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True).stdout.split()
+    return float(output[0]), int(output[1]), output[2] if len(output) > 2 else ""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=0.25, help="Allowed relative overhead of 'core' over 'torch'.")
+    args = parser.parse_args()
+
+    results = {}
+    for name, snippet in SNIPPETS.items():
+        runs = [measure(snippet) for _ in range(args.repeats)]
+        results[name] = (statistics.median(r[0] for r in runs), max(r[1] for r in runs), runs[-1][2])
+        seconds, max_rss, heavy = results[name]
+        print(f"{name:>6}: {seconds * 1000:8.1f} ms  peak RSS {max_rss / 1024:7.1f} MB  heavy modules: {heavy or 'none'}")
+
+    overhead = results["core"][0] / results["torch"][0] - 1
+    print(f"Core import overhead over torch: {overhead:.1%} (budget {args.budget:.0%})")
+    if overhead > args.budget or results["core"][2]:
+        print("Import-time budget exceeded.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Разработанный Адриелу Ванг от ДанСтат Консульти́рования
+
+Benchmark suite for the estimator hot paths: GLM (PerceptronMain), ARIMA
+(ArimaSlp and the TimeSeriesWorkhorse likelihood), VANAR, dynamic panels, DeepIV, DeepGMM,
+Mahalanobis matching and SHAP. Every case runs in a forked child process so
+wall time and peak memory are measured in isolation.
+
+    python benchmarks/run_benchmarks.py --output baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --threshold 0.2
+    python benchmarks/run_benchmarks.py --only glm --full --profile
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = os.path.basename(REPO_ROOT)
+sys.path.insert(0, os.path.dirname(REPO_ROOT))
+
+# Synthetic data generators, seeded so every run sees the same data
+def make_glm(torch, rows, features):
+    torch.manual_seed(0)
+    X = torch.randn(rows, features)
+    y = X @ torch.randn(features, 1) + 0.1 * torch.randn(rows, 1)
+    return X, y
+
+def make_series(torch, rows, variables=1):
+    torch.manual_seed(0)
+    return torch.cumsum(torch.randn(rows, variables), dim=0) * 0.1
+
+def make_panel(torch, entities, periods):
+    torch.manual_seed(0)
+    entity = torch.arange(entities).repeat_interleave(periods)
+    time = torch.arange(periods).repeat(entities)
+    effects = torch.randn(entities).repeat_interleave(periods)
+    y = effects + torch.cumsum(torch.randn(entities, periods), dim=1).view(-1) * 0.1
+    return entity, time, y
+
+def make_iv(torch, rows, features):
+    torch.manual_seed(0)
+    Z = torch.randn(rows, features)
+    X = Z @ torch.randn(features, features) + 0.1 * torch.randn(rows, features)
+    y = torch.tanh(X) @ torch.randn(features, 1) + 0.1 * torch.randn(rows, 1)
+    return X, Z, y
+
+def make_matching(torch, rows, features):
+    torch.manual_seed(0)
+    X = torch.randn(rows, features)
+    treatment = (X[:, 0] + 0.5 * torch.randn(rows) > 0).float()
+    y = 0.7 * treatment + X.sum(dim=1) + 0.1 * torch.randn(rows)
+    return X, y, treatment
+
+# Each runner fits or evaluates one model and returns the number of steps it took
+def run_glm(ep, torch, params, profiler):
+    X, y = make_glm(torch, params["rows"], params["features"])
+    nn = ep.PerceptronMain([params["features"], params["width"], 1], "relu", ep.Optimizers.sgd_optimizer)
+    nn.fit(X, y, epochs=params["epochs"], batch_size=params["batch_size"], learning_rate=1e-4, profiler=profiler)
+    return params["epochs"] * math.ceil(params["rows"] / params["batch_size"])
+
+def run_arima(ep, torch, params, profiler):
+    y = make_series(torch, params["rows"]).view(-1).double()
+    model = ep.ArimaSlp(p=params["lags"], d=1, q=params["lags"])
+    model.fit(y, epochs=params["epochs"], batch_size=params["batch_size"], learning_rate=1e-4, profiler=profiler)
+    return params["epochs"] * math.ceil(params["rows"] / params["batch_size"])
+
+def run_arima_likelihood(ep, torch, params, profiler):
+    y = make_series(torch, params["rows"]).view(-1).double()
+    with profiler.phase("likelihood"):
+        ep.TimeSeriesWorkhorse.arima_estimator_torch(y, params["lags"], 1, params["lags"], learning_rate=1e-6, n_iterations=params["iterations"])
+    return params["iterations"]
+
+def run_vanar(ep, torch, params, profiler):
+    data = make_series(torch, params["rows"])
+    model = ep.Vanar(n_lags=params["lags"], n_variables=1, hidden_layer_sizes=[params["width"]], n_components=params["lags"], autoencoder_activ="relu", forecaster_activ="relu")
+    model.fit(data, auto_epochs=params["epochs"], fore_epochs=params["epochs"], batch_size=params["batch_size"], learning_rate=1e-6, epoch_step=params["epochs"], profiler=profiler)
+    return 2 * params["epochs"] * math.ceil(params["rows"] * 0.8 / params["batch_size"])
+
+def run_panel(ep, torch, params, profiler):
+    entity, time, y = make_panel(torch, params["entities"], params["periods"])
+    model = ep.DynamicPanelSlp(n_lags=params["lags"])
+    model.fit(entity, time, y, epochs=params["epochs"], batch_size=params["batch_size"], learning_rate=1e-4, profiler=profiler)
+    return params["epochs"] * math.ceil(params["entities"] * (params["periods"] - params["lags"]) / params["batch_size"])
+
+def run_deepiv(ep, torch, params, profiler):
+    X, Z, y = make_iv(torch, params["rows"], params["features"])
+    sizes = ([params["features"], params["width"], params["features"]], [params["features"], params["width"], 1])
+    model = ep.DeepIv(*sizes, "relu", "relu", ep.Optimizers.sgd_optimizer)
+    model.fit(X, Z, y, params["epochs"], params["batch_size"], 1e-4, profiler=profiler)
+    return 2 * params["epochs"] * math.ceil(params["rows"] / params["batch_size"])
+
+def run_deepgmm(ep, torch, params, profiler):
+    X, Z, y = make_iv(torch, params["rows"], params["features"])
+    sizes = ([params["features"], params["width"], params["features"]], [params["features"], params["width"], 1])
+    model = ep.DeepGmm(*sizes, "relu", "relu", ep.Optimizers.sgd_optimizer)
+    model.fit(X, Z, y, params["epochs"], params["batch_size"], 1e-4, profiler=profiler)
+    return 2 * params["epochs"] * math.ceil(params["rows"] / params["batch_size"])
+
+def run_matching(ep, torch, params, profiler):
+    X, y, treatment = make_matching(torch, params["rows"], params["features"])
+    matcher = ep.MahalanobisMatcher(n_neighbors=params["neighbors"])
+    with profiler.phase("data_prep"):
+        matcher.fit(X, y, treatment, None, None, None, None, None)
+    with profiler.phase("predict"):
+        matcher.predict(X, treatment)
+    return params["rows"]
+
+def run_shap(ep, torch, params, profiler):
+    X, y = make_glm(torch, params["rows"], params["features"])
+    nn = ep.PerceptronMain([params["features"], params["width"], 1], "relu", ep.Optimizers.sgd_optimizer)
+    nn.fit(X, y, epochs=1, batch_size=64, learning_rate=1e-4)
+    explainer = ep.PerceptronShap(nn, num_samples=params["samples"])
+    with profiler.phase("shap"):
+        explainer.compute_shap_values(X[:params["instances"]], params["features"])
+    return params["instances"]
+
+# Parameter sweeps: (runner, quick grid, full grid)
+SUITES = {
+    "glm": (run_glm,
+            {"rows": [2000], "features": [8], "width": [16], "epochs": [5], "batch_size": [32]},
+            {"rows": [2000, 20000], "features": [8, 64], "width": [16, 128], "epochs": [5], "batch_size": [32, 256]}),
+    "arima": (run_arima,
+              {"rows": [2000], "lags": [2], "epochs": [5], "batch_size": [32]},
+              {"rows": [2000, 20000], "lags": [2, 8], "epochs": [5], "batch_size": [32, 256]}),
+    "arima_likelihood": (run_arima_likelihood,
+                         {"rows": [300], "lags": [2], "iterations": [5]},
+                         {"rows": [300, 1000], "lags": [2, 5], "iterations": [5]}),
+    "vanar": (run_vanar,
+              {"rows": [1000], "lags": [5], "width": [10], "epochs": [5], "batch_size": [64]},
+              {"rows": [1000, 10000], "lags": [5, 20], "width": [10, 64], "epochs": [5], "batch_size": [64]}),
+    "panel": (run_panel,
+              {"entities": [10000], "periods": [20], "lags": [2], "epochs": [1], "batch_size": [4096]},
+              {"entities": [10000, 200000], "periods": [20, 50], "lags": [2, 8], "epochs": [1], "batch_size": [4096]}),
+    "deepiv": (run_deepiv,
+               {"rows": [2000], "features": [4], "width": [16], "epochs": [5], "batch_size": [32]},
+               {"rows": [2000, 20000], "features": [4, 32], "width": [16, 128], "epochs": [5], "batch_size": [32, 256]}),
+    "deepgmm": (run_deepgmm,
+                {"rows": [2000], "features": [4], "width": [16], "epochs": [5], "batch_size": [32]},
+                {"rows": [2000, 20000], "features": [4, 32], "width": [16, 128], "epochs": [5], "batch_size": [32, 256]}),
+    "matching": (run_matching,
+                 {"rows": [1000], "features": [4], "neighbors": [5]},
+                 {"rows": [1000, 5000], "features": [4, 32], "neighbors": [1, 10]}),
+    "shap": (run_shap,
+             {"rows": [200], "features": [8], "width": [16], "samples": [500], "instances": [20]},
+             {"rows": [200], "features": [8, 32], "width": [16, 128], "samples": [500, 2000], "instances": [20]}),
+}
+
+def expand(grid):
+    names = sorted(grid)
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+def case_id(suite, params):
+    return suite + "[" + ",".join(f"{name}={params[name]}" for name in sorted(params)) + "]"
+
+def read_status(field):
+    # Value in kB from /proc/self/status, or None off Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def run_case(suite, params, profile, connection):
+    ep = importlib.import_module(PACKAGE_NAME)
+    torch = importlib.import_module("torch")
+    profiler = ep.PhaseProfiler() if profile else importlib.import_module(PACKAGE_NAME + ".PerceptronProfiling").NULL_PROFILER
+    runner = SUITES[suite][0]
+
+    # Reset the high-water mark so peak RSS covers this case only
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    baseline_kb = read_status("VmRSS") or 0
+
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            steps = runner(ep, torch, params, profiler)
+        seconds = time.perf_counter() - start
+    except Exception as error:
+        connection.send({"error": f"{type(error).__name__}: {error}"})
+        return
+
+    peak_kb = read_status("VmHWM") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result = {"seconds": seconds, "peak_memory_mb": max(peak_kb - baseline_kb, 0) / 1024, "steps": steps, "steps_per_second": steps / seconds if seconds > 0 else None}
+    if profile:
+        result["phases"] = profiler.summary()
+    connection.send(result)
+
+def run_isolated(suite, params, profile):
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=run_case, args=(suite, params, profile, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"error": f"benchmark process exited with code {process.exitcode}"}
+    process.join()
+    return result
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or "seconds" not in result or "seconds" not in baseline[name]:
+            continue
+        change = result["seconds"] / baseline[name]["seconds"] - 1
+        flag = "REGRESSION" if change > threshold else ("faster" if change < -threshold else "")
+        print(f"{name:<70} {baseline[name]['seconds']:9.3f}s -> {result['seconds']:9.3f}s  {change:+7.1%}  {flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="*", choices=sorted(SUITES), help="Run only these suites.")
+    parser.add_argument("--full", action="store_true", help="Run the full parameter sweep instead of the quick one.")
+    parser.add_argument("--repeats", type=int, default=1, help="Keep the fastest of this many runs per case.")
+    parser.add_argument("--profile", action="store_true", help="Record per-phase timings from inside fit.")
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    parser.add_argument("--compare", help="Baseline JSON file to compare wall times against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown that counts as a regression.")
+    args = parser.parse_args()
+
+    torch = importlib.import_module("torch")
+
+    results = {}
+    for suite in args.only or sorted(SUITES):
+        grid = SUITES[suite][2] if args.full else SUITES[suite][1]
+        for params in expand(grid):
+            name = case_id(suite, params)
+            runs = [run_isolated(suite, params, args.profile) for _ in range(args.repeats)]
+            successful = [run for run in runs if "error" not in run]
+            results[name] = min(successful, key=lambda run: run["seconds"]) if successful else runs[-1]
+            result = results[name]
+            if "error" in result:
+                print(f"{name:<70} failed: {result['error']}")
+            else:
+                print(f"{name:<70} {result['seconds']:9.3f}s  {result['peak_memory_mb']:8.1f} MB  {result['steps_per_second'] or 0:10.1f} steps/s")
+                for phase, entry in sorted(result.get("phases", {}).items()):
+                    print(f"{'':<8}{phase:>16}: {entry['seconds']:9.4f}s  {entry['calls']:8d} calls")
+
+    if args.output:
+        meta = {"python": platform.python_version(), "torch": torch.__version__, "platform": platform.platform(), "threads": torch.get_num_threads(), "full": args.full}
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(REPO_ROOT))
+ep = importlib.import_module(os.path.basename(REPO_ROOT))
+
+
+class SeededPerceptron(ep.PerceptronMain):
+    # Draws its initial weights the way a seeded PerceptronEnsemble member does
+    def __init__(self, seed, *args, **kwargs):
+        self.seed = seed
+        super().__init__(*args, **kwargs)
+
+    def initialize_weights(self, dtype=torch.float64):
+        generator = torch.Generator().manual_seed(self.seed)
+        self.weights = [torch.randn(n, m, dtype=dtype, generator=generator) for n, m in zip(self.layer_sizes[:-1], self.layer_sizes[1:])]
+        self.velocity = None
+        self.squared_gradients = [torch.zeros_like(w) for w in self.weights]
+
+
+@pytest.mark.parametrize("optimizer", [ep.Optimizers.sgd_optimizer, ep.Optimizers.adagrad_optimizer])
+def test_ensemble_member_matches_standalone_training(optimizer):
+    torch.manual_seed(0)
+    X = torch.randn(50, 3, dtype=torch.float64)
+    y = torch.sin(X.sum(dim=1, keepdim=True))
+    seeds = [11, 12, 13]
+
+    ensemble = ep.PerceptronEnsemble(len(seeds), [3, 5, 1], "tanh", optimizer, weight_decay=0.01, seeds=seeds)
+    ensemble.fit(X, y, epochs=3, batch_size=16, learning_rate=1e-3, momentum=0.5, monitor=ep.TrainingMonitor())
+
+    for index, seed in enumerate(seeds):
+        standalone = SeededPerceptron(seed, [3, 5, 1], "tanh", optimizer, weight_decay=0.01)
+        standalone.fit(X, y, epochs=3, batch_size=16, learning_rate=1e-3, momentum=0.5, monitor=ep.TrainingMonitor())
+
+        member = ensemble.member(index)
+        for member_weight, standalone_weight in zip(member.weights, standalone.weights):
+            torch.testing.assert_close(member_weight, standalone_weight)
+        torch.testing.assert_close(ensemble.predict(X)[0][index], standalone.predict(X))
@@ -0,0 +1,89 @@
+import importlib
+import math
+import os
+import sys
+from collections import defaultdict
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(REPO_ROOT))
+ep = importlib.import_module(os.path.basename(REPO_ROOT))
+
+
+def shuffled_panel():
+    # Entities of 4, 1 and 5 periods, given out of order
+    rows = [(entity, t, float(10 * entity + t * t)) for entity, periods in ((7, 4), (3, 1), (5, 5)) for t in range(periods)]
+    order = torch.randperm(len(rows), generator=torch.Generator().manual_seed(0)).tolist()
+    rows = [rows[i] for i in order]
+    entity, time, values = (torch.tensor(column) for column in zip(*rows))
+    return ep.PanelWorkhorse(entity, time, values.double()), rows
+
+
+def grouped(rows):
+    # Reference groupby: each entity's values in time order
+    groups = defaultdict(list)
+    for entity, t, value in sorted(rows, key=lambda row: (row[0], row[1])):
+        groups[entity].append(value)
+    return groups
+
+
+def test_panel_is_sorted_by_entity_then_time():
+    panel, rows = shuffled_panel()
+    expected = sorted(rows, key=lambda row: (row[0], row[1]))
+    assert panel.entity.tolist() == [row[0] for row in expected]
+    assert panel.time.tolist() == [row[1] for row in expected]
+    assert panel.counts.tolist() == [1, 5, 4]
+
+
+def test_lags_stay_within_entity():
+    panel, rows = shuffled_panel()
+    groups = grouped(rows)
+    lag_rows, lagged = panel.lags(panel.values, 2)
+
+    expected = []
+    for entity in sorted(groups):
+        series = groups[entity]
+        expected.extend([series[t - 1], series[t - 2]] for t in range(2, len(series)))
+    assert lagged.tolist() == expected
+    assert (panel.position[lag_rows] >= 2).all()
+
+
+def test_difference_matches_groupby():
+    panel, rows = shuffled_panel()
+    groups = grouped(rows)
+    differenced = panel.difference(panel.values).view(-1).tolist()
+
+    expected = []
+    for entity in sorted(groups):
+        series = groups[entity]
+        expected.extend([math.nan] + [series[t] - series[t - 1] for t in range(1, len(series))])
+    assert len(differenced) == len(expected)
+    for value, reference in zip(differenced, expected):
+        assert (math.isnan(value) and math.isnan(reference)) or value == pytest.approx(reference)
+
+
+def test_demean_matches_groupby():
+    panel, rows = shuffled_panel()
+    groups = grouped(rows)
+    demeaned = panel.demean(panel.values).view(-1).tolist()
+
+    expected = []
+    for entity in sorted(groups):
+        series = groups[entity]
+        mean = sum(series) / len(series)
+        expected.extend(value - mean for value in series)
+    assert demeaned == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("sizes, rows_per_batch, bounds", [
+    ([100, 1, 150], 100, [0, 100, 251]),
+    ([30, 30, 30, 30], 50, [0, 60, 120]),
+    ([10, 10, 5], 100, [0, 25]),
+    ([], 10, [0]),
+])
+def test_entity_batches_split_greedily(sizes, rows_per_batch, bounds):
+    codes = torch.repeat_interleave(torch.arange(len(sizes)), torch.tensor(sizes, dtype=torch.long))
+    assert ep.PanelWorkhorse.entity_batches(codes, rows_per_batch).tolist() == bounds
@@ -0,0 +1,55 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(REPO_ROOT))
+ep = importlib.import_module(os.path.basename(REPO_ROOT))
+
+
+def ar_series(n=60, dtype=torch.float64):
+    torch.manual_seed(0)
+    y = torch.zeros(n, dtype=dtype)
+    noise = torch.randn(n, dtype=dtype) * 0.1
+    for t in range(1, n):
+        y[t] = 0.5 * y[t - 1] + noise[t]
+    return y
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.float64])
+def test_arima_slp_without_policy_keeps_data_dtype(dtype):
+    model = ep.ArimaSlp(p=1, d=0, q=1, precision=None)
+    model.fit(ar_series(dtype=dtype), epochs=2, batch_size=16, learning_rate=1e-4, epoch_step=1, monitor=ep.TrainingMonitor())
+    assert model.weights[0].dtype == dtype
+    assert model.predict_next_period(ar_series(dtype=dtype), 2).shape == (2,)
+
+
+def test_arima_estimator_without_policy_keeps_data_dtype():
+    ar_coeffs, _, _ = ep.TimeSeriesWorkhorse.arima_estimator_torch(ar_series(dtype=torch.float32), 1, 0, 1, n_iterations=2, precision=None)
+    assert ar_coeffs.dtype == torch.float32
+
+
+def test_dynamic_panel_without_policy_keeps_data_dtype():
+    entity = torch.repeat_interleave(torch.arange(3), 10)
+    time = torch.arange(10).repeat(3)
+    y = torch.randn(30, dtype=torch.float32)
+    model = ep.DynamicPanelSlp(n_lags=1, precision=None)
+    model.fit(entity, time, y, epochs=2, batch_size=10, learning_rate=1e-4, epoch_step=1, monitor=ep.TrainingMonitor())
+    assert model.weights[0].dtype == torch.float32
+
+
+def test_bfloat16_keeps_targets_and_residuals_in_float32():
+    # With zero inputs and no bias the output is exactly 0, so the loss is the squared target.
+    # 1000.25 has no bfloat16 representation; rounding y would report 1000 ** 2.
+    X = torch.zeros(32, 2)
+    y = torch.full((32, 1), 1000.25)
+    sink = ep.InMemorySink()
+    nn = ep.PerceptronMain([2, 1], "linear", ep.Optimizers.sgd_optimizer, add_bias=False, precision="bfloat16")
+    nn.fit(X, y, epochs=1, batch_size=32, learning_rate=0.0, monitor=ep.TrainingMonitor([sink]))
+
+    assert nn.forward(X.to(torch.bfloat16)).dtype == torch.float32
+    assert sink.events("epoch_end")[0]["loss"] == pytest.approx(1000.25 ** 2, rel=1e-6)
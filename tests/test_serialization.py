@@ -0,0 +1,61 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(REPO_ROOT))
+ep = importlib.import_module(os.path.basename(REPO_ROOT))
+
+
+def test_vanar_round_trip_keeps_precision_and_refits(tmp_path):
+    torch.manual_seed(0)
+    data = torch.cumsum(torch.randn(80, 1, dtype=torch.float64), dim=0) * 0.1
+    vanar = ep.Vanar(n_lags=3, n_variables=1, hidden_layer_sizes=[4], n_components=3, precision="float32")
+    vanar.fit(data, auto_epochs=2, fore_epochs=2, batch_size=16, learning_rate=1e-6, epoch_step=1, monitor=ep.TrainingMonitor())
+
+    path = tmp_path / "vanar.econmet"
+    ep.ModelSerializer.save(vanar, str(path))
+    loaded = ep.ModelSerializer.load(str(path))
+
+    assert isinstance(loaded.precision, ep.PrecisionPolicy)
+    assert loaded.precision.param_dtype == torch.float32
+    assert isinstance(loaded.forecaster.precision, ep.PrecisionPolicy)
+    torch.testing.assert_close(loaded.forecaster.predict(loaded.X_encoded), vanar.forecaster.predict(vanar.X_encoded))
+
+    loaded.fit(data, auto_epochs=2, fore_epochs=2, batch_size=16, learning_rate=1e-6, epoch_step=1, monitor=ep.TrainingMonitor())
+    assert loaded.forecaster.weights[0].dtype == torch.float32
+
+
+def test_saving_over_a_loaded_model_keeps_its_mapping_valid(tmp_path):
+    torch.manual_seed(0)
+    X = torch.randn(64, 3)
+    y = X @ torch.randn(3, 1)
+    nn = ep.PerceptronMain([3, 4, 1], "relu", ep.Optimizers.sgd_optimizer)
+    nn.fit(X, y, epochs=2, batch_size=16, learning_rate=1e-4, monitor=ep.TrainingMonitor())
+
+    path = str(tmp_path / "glm.econmet")
+    ep.ModelSerializer.save(nn, path)
+    loaded = ep.ModelSerializer.load(path)
+    ep.ModelSerializer.save(loaded, path)
+
+    torch.testing.assert_close(loaded.predict(X), nn.predict(X))
+    torch.testing.assert_close(ep.ModelSerializer.load(path).predict(X), nn.predict(X))
+
+
+def test_vanar_without_policy_round_trips_and_refits(tmp_path):
+    torch.manual_seed(0)
+    data = torch.cumsum(torch.randn(80, 1, dtype=torch.float64), dim=0) * 0.1
+    vanar = ep.Vanar(n_lags=3, n_variables=1, hidden_layer_sizes=[4], n_components=3)
+    vanar.fit(data, auto_epochs=2, fore_epochs=2, batch_size=16, learning_rate=1e-6, epoch_step=1, monitor=ep.TrainingMonitor())
+
+    path = str(tmp_path / "vanar.econmet")
+    ep.ModelSerializer.save(vanar, path)
+    loaded = ep.ModelSerializer.load(path)
+
+    assert loaded.precision is None
+    loaded.fit(data, auto_epochs=2, fore_epochs=2, batch_size=16, learning_rate=1e-6, epoch_step=1, monitor=ep.TrainingMonitor())
+    assert loaded.forecaster.weights[0].dtype == torch.float64
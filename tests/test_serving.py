@@ -0,0 +1,65 @@
+import importlib
+import os
+import sys
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(REPO_ROOT))
+ep = importlib.import_module(os.path.basename(REPO_ROOT))
+
+
+class RecordingPredict:
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.batch_sizes = []
+
+    def __call__(self, X):
+        if self.gate is not None:
+            self.gate.wait()
+        self.batch_sizes.append(X.shape[0])
+        return X.sum(dim=1)
+
+
+def test_cancelled_request_is_dropped_and_worker_survives():
+    gate = threading.Event()
+    predict = RecordingPredict(gate)
+    with ep.MicroBatcher(predict, max_batch_size=1, max_latency=0.0) as batcher:
+        first = batcher.submit([1.0, 2.0])
+        cancelled = batcher.submit([3.0, 4.0])
+        assert cancelled.cancel()
+        gate.set()
+
+        assert first.result(timeout=5) == 3.0
+        assert batcher.predict([5.0, 6.0], timeout=5) == 11.0
+        assert batcher.worker.is_alive()
+    assert predict.batch_sizes == [1, 1]
+
+
+def test_close_dispatches_pending_requests():
+    predict = RecordingPredict()
+    batcher = ep.MicroBatcher(predict, max_batch_size=64, max_latency=60.0)
+    futures = [batcher.submit([float(i)]) for i in range(3)]
+    batcher.close()
+
+    assert [float(future.result(timeout=0)) for future in futures] == [0.0, 1.0, 2.0]
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.submit([0.0])
+
+
+def test_batch_dispatches_at_deadline():
+    predict = RecordingPredict()
+    with ep.MicroBatcher(predict, max_batch_size=64, max_latency=0.01) as batcher:
+        assert batcher.predict([1.0, 1.0], timeout=5) == 2.0
+    assert predict.batch_sizes == [1]
+
+
+def test_batch_dispatches_when_full():
+    predict = RecordingPredict()
+    with ep.MicroBatcher(predict, max_batch_size=4, max_latency=60.0) as batcher:
+        futures = [batcher.submit([float(i)]) for i in range(4)]
+        assert [float(future.result(timeout=5)) for future in futures] == [0.0, 1.0, 2.0, 3.0]
+    assert predict.batch_sizes == [4]